@@ -1,158 +1,190 @@
 import os
+import io
 import click
 import gzip
-import xml.etree.ElementTree as ET
 import sqlite3
 import uuid
 import logging
 import traceback
-import html
 import re
-from openai import OpenAI
+import itertools
+import asyncio
+import random
+import webbrowser
+from contextlib import closing
+from pathlib import Path
+from openai import AsyncOpenAI, APIConnectionError, InternalServerError, RateLimitError
+
+# Prefer lxml's libxml2-backed parser, fall back to the standard library
+try:
+    from lxml import etree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+
+# Prefer ISA-L's accelerated gzip, which decompresses on a background thread
+try:
+    from isal import igzip_threaded as gzip_reader
+except ImportError:
+    gzip_reader = gzip
 
 # Configure logging
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Read buffer wrapped around the decompressed stream handed to the XML parser
+READ_BUFFER_SIZE = 1024 * 1024
+
+# Cards per multi-row INSERT; 5 values each stays below SQLite's historic 999 variable limit
+CARDS_PER_INSERT = 199
+
+# Cards drawn as vocabulary for each example story
+VOCAB_ITEMS = 15
+
+# Prompt budget for the vocabulary items, roughly 4 characters per token, and
+# the cap on tokens generated per story
+VOCAB_CHAR_BUDGET = 6000
+MAX_STORY_TOKENS = 1500
+
+# Upper bound on example story requests in flight at once
+MAX_CONCURRENT_REQUESTS = 10
+
+# Attempts per story request and the cap on the backoff between them, in seconds
+REQUEST_ATTEMPTS = 5
+MAX_RETRY_DELAY = 60
+
+# Transient API failures worth retrying; APITimeoutError is an APIConnectionError
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
+
+# Dialog line starts and [vocabulary item](hint) clozes in a generated story
+DIALOG_LINE_RE = re.compile(r'^(A:|B:)', re.MULTILINE)
+CLOZE_RE = re.compile(r'\[([^\]]*)\]\(([^)]*)\)')
+
+# Same escaping as html.escape(quote=True), applied in a single str.translate pass
+HTML_ESCAPE = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#x27;'})
+
 @click.command()
 @click.option('-i', '--input', 'input_file', type=click.Path(exists=True), required=True, help='Input Pauker .pau.gz file')
 @click.option('-o', '--output', 'output', type=click.Path(), required=True, help='Output SQLite database file')
 @click.option('--example', is_flag=True, help='Generate an example story using vocabulary from cards not in batch 1')
 @click.option('--model', type=click.Choice(['openai', 'gemini'], case_sensitive=False), default='openai', help='Specify the model to use for generating the example story')
-def convert_pauker_to_sqlite(input_file, output, example, model):
+@click.option('--example-count', type=click.IntRange(min=1), default=1, help='Number of example stories to generate concurrently with --example')
+@click.option('-v', '--verbose', is_flag=True, help='Enable debug logging')
+def convert_pauker_to_sqlite(input_file, output, example, model, example_count, verbose):
     """
     Convert Pauker .pau.gz flashcard file to SQLite database
     """
+    if verbose:
+        logger.setLevel(logging.DEBUG)
+
     try:
         logger.debug(f"Starting conversion of {input_file}")
         
-        # Log input file details
-        logger.debug(f"Input file path: {input_file}")
-        logger.debug(f"Input file exists: {os.path.exists(input_file)}")
-        logger.debug(f"Input file size: {os.path.getsize(input_file)} bytes")
+        # Log input file details; click has already checked that it exists
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Input file path: {input_file}")
+            logger.debug(f"Input file size: {os.stat(input_file).st_size} bytes")
 
-        # Ensure output directory exists
-        output_dir = os.path.dirname(os.path.abspath(output))
-        logger.debug(f"Output directory: {output_dir}")
-        os.makedirs(output_dir, exist_ok=True)
-
-        # Open the gzipped file with extensive logging
-        try:
-            logger.debug("Attempting to open gzipped file")
-            with gzip.open(input_file, 'rt', encoding='utf-8') as f:
-                logger.debug("Successfully opened gzipped file")
-                
-                # Parse the XML with detailed logging
-                try:
-                    logger.debug("Parsing XML")
-                    tree = ET.parse(f)
-                    root = tree.getroot()
-                    logger.debug(f"XML root tag: {root.tag}")
-                except ET.ParseError as xml_err:
-                    logger.error(f"XML Parsing error: {xml_err}")
-                    logger.error(traceback.format_exc())
-                    raise
-
-        except (IOError, gzip.BadGzipFile) as gz_err:
-            logger.error(f"Error opening gzipped file: {gz_err}")
-            logger.error(traceback.format_exc())
-            raise
+        # Ensure output directory exists; a bare filename goes to the working directory
+        output_dir = os.path.dirname(output)
+        if output_dir:
+            logger.debug(f"Output directory: {output_dir}")
+            os.makedirs(output_dir, exist_ok=True)
 
         # Create/connect to SQLite database with logging
         try:
             logger.debug(f"Attempting to create SQLite database: {output}")
-            conn = sqlite3.connect(output)
-            cursor = conn.cursor()
-            logger.debug("SQLite connection established")
-
-            # Create tables if they don't exist
-            # Drop and recreate cards table to ensure fresh start
-            cursor.execute('DROP TABLE IF EXISTS cards')
-            cursor.execute('''
-                CREATE TABLE cards (
-                    id TEXT PRIMARY KEY,
-                    batch_number INTEGER,
-                    front_text TEXT,
-                    back_text TEXT,
-                    learned_timestamp INTEGER
-                )
-            ''')
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS examples (
-                    id TEXT PRIMARY KEY,
-                    date DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    body TEXT
-                )
-            ''')
-            logger.debug("Cards and Examples tables created")
-
-            # Track number of cards processed
-            total_cards = 0
-            total_batches = 0
-
-            # Process batches with detailed logging
-            batches = root.findall('.//Batch')
-            logger.debug(f"Total batches found: {len(batches)}")
-
-            for batch_index, batch in enumerate(batches, 1):
-                total_batches += 1
-                logger.debug(f"Processing batch {batch_index}")
-                
-                cards = batch.findall('Card')
-                logger.debug(f"Cards in batch {batch_index}: {len(cards)}")
-                
-                for card_index, card in enumerate(cards, 1):
-                    # Extract front side details with logging
-                    front_side = card.find('FrontSide')
-                    front_text = ''
-                    learned_timestamp = 0
-                    
-                    if front_side is not None:
-                        front_text_elem = front_side.find('Text')
-                        if front_text_elem is not None:
-                            front_text = f'"{front_text_elem.text or ""}"'
-                        learned_timestamp = front_side.get('LearnedTimestamp', 0)
-                    
-                    # Extract reverse side details with logging
-                    reverse_side = card.find('ReverseSide')
-                    back_text = ''
-                    
-                    if reverse_side is not None:
-                        back_text_elem = reverse_side.find('Text')
-                        if back_text_elem is not None:
-                            back_text = f'"{back_text_elem.text or ""}"'
-
-                    # Create simple sequential card identifier
-                    card_id = f'card{total_cards + 1}'
-
-                    # Log card details before insertion
-                    logger.debug(f"Card details - Batch: {batch_index}, ID: {card_id}")
-                    logger.debug(f"Front text: {front_text[:50]}...")
-                    logger.debug(f"Back text: {back_text[:50]}...")
-
-                    # Insert into database
+            # Build the database in memory and write it to disk once at the end.
+            # Autocommit mode; the bulk load manages its own transaction
+            with closing(sqlite3.connect(':memory:', isolation_level=None)) as conn:
+                cursor = conn.cursor()
+                logger.debug("SQLite connection established")
+
+                # Keep temporary structures in memory and give the build a 64 MiB page cache
+                cursor.executescript('''
+                    PRAGMA temp_store=MEMORY;
+                    PRAGMA cache_size=-65536;
+                ''')
+
+                # Start from a previous conversion, so its example stories and any
+                # other tables, views or triggers are kept; only cards is replaced
+                if os.path.exists(output):
+                    load_previous_output(conn, output)
+
+                create_tables(cursor)
+                logger.debug("Cards and Examples tables created")
+
+                # Track number of batches and cards processed
+                counts = {'batches': 0, 'cards': 0}
+
+                # Example stories stored in this run, as (example_id, story) pairs
+                stories = []
+
+                # Load all cards and the example stories in a single transaction. If
+                # anything fails, the in-memory database is thrown away and nothing is
+                # written to output, which only ever receives the finished copy below
+                with conn:
+                    conn.execute('BEGIN')
+
+                    # Open the gzipped file with extensive logging
                     try:
-                        cursor.execute('''
-                            INSERT INTO cards 
-                            (id, batch_number, front_text, back_text, learned_timestamp)
-                            VALUES (?, ?, ?, ?, ?)
-                        ''', (card_id, batch_index, front_text, back_text, learned_timestamp))
-                        total_cards += 1
-                    except sqlite3.Error as sql_err:
-                        logger.error(f"SQLite insertion error: {sql_err}")
+                        logger.debug("Attempting to open gzipped file")
+                        with open(input_file, 'rb', buffering=READ_BUFFER_SIZE) as raw:
+                            # The file is read front to back once, let the kernel read ahead
+                            if hasattr(os, 'posix_fadvise'):
+                                os.posix_fadvise(raw.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+
+                            with gzip_reader.open(raw, 'rb') as gz, \
+                                    io.BufferedReader(gz, buffer_size=READ_BUFFER_SIZE) as f:
+                                logger.debug("Successfully opened gzipped file")
+
+                                # Stream parsed cards straight into the database
+                                try:
+                                    logger.debug("Parsing XML")
+                                    insert_cards(cursor, iter_cards(f, counts))
+
+                                except ET.ParseError as xml_err:
+                                    logger.error(f"XML Parsing error: {xml_err}")
+                                    logger.error(traceback.format_exc())
+                                    raise
+
+                    except (IOError, gzip.BadGzipFile) as gz_err:
+                        logger.error(f"Error opening gzipped file: {gz_err}")
                         logger.error(traceback.format_exc())
+                        raise
 
-            if example:
-                story = generate_example_story(conn, batch_index=1, model=model)  # Default to batch 1
-                if story is None:
-                    logger.warning("Skipping example story generation due to missing API key")
+                    # Index the cards the example story draws from, built once after the load
+                    cursor.execute('CREATE INDEX idx_cards_vocabulary ON cards(batch_number) WHERE batch_number != 1')
 
-            # Commit the transaction and close the connection
-            conn.commit()
-            conn.close()
+                    if example:
+                        stories = generate_example_stories(conn, model=model, count=example_count)
+                        if stories is None:
+                            logger.warning("Skipping example story generation due to missing API key")
+                            stories = []
+
+                # Write a compact copy next to the output, then swap it in
+                tmp_output = f"{output}.tmp"
+                if os.path.exists(tmp_output):
+                    os.remove(tmp_output)
+                try:
+                    conn.execute('VACUUM INTO ?', (tmp_output,))
+                    # VACUUM INTO does not sync the file it writes; it must be on disk
+                    # before it replaces the output holding the previous example stories
+                    fsync_file(tmp_output)
+                    os.replace(tmp_output, output)
+                finally:
+                    # Only left behind when writing or swapping in the copy failed
+                    if os.path.exists(tmp_output):
+                        os.remove(tmp_output)
+
+            # Make the rename itself durable
+            fsync_directory(output_dir)
+
+            # Only show stories once they are safely stored in the output
+            for example_id, story in stories:
+                write_example_page(example_id, story)
             logger.info(f"Successfully created SQLite database: {output}")
-            logger.info(f"Total batches processed: {total_batches}")
-            logger.info(f"Total cards processed: {total_cards}")
+            logger.info(f"Total batches processed: {counts['batches']}")
+            logger.info(f"Total cards processed: {counts['cards']}")
 
         except sqlite3.Error as db_err:
             logger.error(f"SQLite database error: {db_err}")
@@ -164,42 +196,211 @@ def convert_pauker_to_sqlite(input_file, output, example, model):
         logger.error(traceback.format_exc())
         raise
 
-def generate_example_story(conn, batch_index, model):
+def fsync_file(path):
+    """
+    Flush a file's contents to disk
+    """
+    with open(path, 'rb+') as f:
+        os.fsync(f.fileno())
+
+def fsync_directory(path):
+    """
+    Flush changes to a directory's entries, such as a rename, to disk where the platform allows it
+    """
+    # Directories cannot be opened for fsync on Windows
+    if os.name != 'posix':
+        return
+    fd = os.open(path or '.', os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def create_tables(cursor):
+    """
+    Create a fresh cards table and the examples table if it is missing
+    """
+    # Create tables if they don't exist
+    # Drop and recreate cards table to ensure fresh start
+    cursor.execute('DROP TABLE IF EXISTS cards')
+    cursor.execute('''
+        CREATE TABLE cards (
+            id INTEGER PRIMARY KEY,
+            batch_number INTEGER,
+            front_text TEXT,
+            back_text TEXT,
+            learned_timestamp INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS examples (
+            id TEXT PRIMARY KEY,
+            date DATETIME DEFAULT CURRENT_TIMESTAMP,
+            body TEXT
+        )
+    ''')
+
+def load_previous_output(conn, path):
+    """
+    Copy an existing output database, schema and contents, into conn
+    """
+    with closing(sqlite3.connect(path)) as previous:
+        previous.backup(conn)
+
+def iter_cards(f, counts):
+    """
+    Stream card rows from a Pauker XML file, keeping only the current card in memory
+
+    Yields (id, batch_number, front_text, back_text, learned_timestamp) tuples and
+    keeps the running batch and card totals in counts.
+    """
+    context = ET.iterparse(f, events=('start', 'end'))
+    _, root = next(context)
+    logger.debug("XML root tag: %s", root.tag)
+
+    # Card total when the current batch started, for the per-batch summary
+    batch_start = 0
+
+    for event, elem in context:
+        if event == 'start':
+            # Batches are numbered in document order
+            if elem.tag == 'Batch':
+                counts['batches'] += 1
+                batch_start = counts['cards']
+                logger.debug("Processing batch %d", counts['batches'])
+            continue
+
+        if elem.tag == 'Batch':
+            logger.info("Batch %d: %d cards", counts['batches'], counts['cards'] - batch_start)
+
+            # Release the finished batch and its cleared cards
+            elem.clear()
+            root.clear()
+            continue
+
+        if elem.tag != 'Card':
+            continue
+
+        card = elem
+
+        # Extract both sides in a single pass over the card's children
+        front_text = ''
+        back_text = ''
+        learned_timestamp = 0
+
+        for side in card:
+            if side.tag == 'FrontSide':
+                front_text = side.findtext('Text', '')
+                timestamp = side.get('LearnedTimestamp')
+                learned_timestamp = int(timestamp) if timestamp else 0
+            elif side.tag == 'ReverseSide':
+                back_text = side.findtext('Text', '')
+
+        # The card's contents are extracted, drop its subtree
+        card.clear()
+
+        # Cards without any text carry no information
+        if not (front_text or back_text):
+            continue
+
+        # Sequential card identifier, stored as the table's rowid
+        counts['cards'] += 1
+        yield (counts['cards'], counts['batches'], front_text, back_text, learned_timestamp)
+
+def card_insert_sql(row_count):
+    """
+    Build an INSERT statement for row_count cards
+    """
+    placeholders = ', '.join(['(?, ?, ?, ?, ?)'] * row_count)
+    return f'INSERT INTO cards (id, batch_number, front_text, back_text, learned_timestamp) VALUES {placeholders}'
+
+def insert_cards(cursor, rows):
+    """
+    Insert card rows CARDS_PER_INSERT at a time with multi-row INSERT statements
+    """
+    # Every full chunk reuses the same SQL text, so it stays in the statement cache
+    chunk_sql = card_insert_sql(CARDS_PER_INSERT)
+    rows = iter(rows)
+    try:
+        while True:
+            chunk = list(itertools.islice(rows, CARDS_PER_INSERT))
+            if not chunk:
+                break
+            sql = chunk_sql if len(chunk) == CARDS_PER_INSERT else card_insert_sql(len(chunk))
+            cursor.execute(sql, list(itertools.chain.from_iterable(chunk)))
+    except sqlite3.Error as sql_err:
+        logger.error(f"SQLite insertion error: {sql_err}")
+        logger.error(traceback.format_exc())
+        raise
+
+def process_cloze(match):
+    """
+    Render a [vocabulary item](hint) cloze as a clickable span followed by its hint
+    """
+    escaped_content = match.group(1).translate(HTML_ESCAPE)
+    escaped_hint = match.group(2).translate(HTML_ESCAPE)
+    return f'<span class="cloze" onclick="revealCloze(this)" data-original="{escaped_content}" title="{escaped_hint}">[…]</span><span class="hint">({escaped_hint})</span>'
+
+def client_options(model):
+    """
+    Return the OpenAI client arguments for the selected model, or None if its API key is missing
+    """
     if model.lower() == 'gemini':
         api_key = os.environ.get('GEMINI_API_KEY')
         if not api_key:
             logger.error("GEMINI_API_KEY environment variable not set")
             return None
 
-        client = OpenAI(
-            api_key=api_key,
-            base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
-        )
-    else:
-        api_key = os.environ.get('OPENAI_API_KEY')
-        if not api_key:
-            logger.error("OPENAI_API_KEY environment variable not set")
-            return None
+        return {
+            'api_key': api_key,
+            'base_url': "https://generativelanguage.googleapis.com/v1beta/openai/"
+        }
 
-        client = OpenAI(
-            api_key=api_key
-        )
+    api_key = os.environ.get('OPENAI_API_KEY')
+    if not api_key:
+        logger.error("OPENAI_API_KEY environment variable not set")
+        return None
 
-    # Query database for cards not in batch 1, sorted by learned_timestamp
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT front_text, back_text 
+    return {'api_key': api_key}
+
+def fetch_vocabulary_ids(conn):
+    """
+    Return the ids of the cards outside batch 1 that stories draw vocabulary from
+
+    Cards without any text are already skipped by iter_cards, so every row qualifies.
+    """
+    cursor = conn.execute('''
+        SELECT id
         FROM cards 
         WHERE batch_number != 1 
-        ORDER BY random()
-        LIMIT 15
     ''')
+    return [card_id for (card_id,) in cursor]
+
+def build_story_prompt(conn, vocabulary_ids):
+    """
+    Build the story prompt from a random selection of the cards in vocabulary_ids
+    """
+    # Sample in Python and fetch only the chosen cards instead of sorting them all by random()
+    chosen = random.sample(vocabulary_ids, min(VOCAB_ITEMS, len(vocabulary_ids)))
+    placeholders = ', '.join('?' * len(chosen))
+    cards = {
+        card_id: (front_text, back_text)
+        for card_id, front_text, back_text in conn.execute(
+            f'SELECT id, front_text, back_text FROM cards WHERE id IN ({placeholders})', chosen
+        )
+    }
     
-    vocab_list = []
-    for front_text, back_text in cursor.fetchall():
-        # Only add non-empty entries
-        if front_text or back_text:
-            vocab_list.append(f"{front_text},{back_text}")
+    # Quote items as the prompt describes, stopping before the vocabulary budget is exceeded
+    items = []
+    used = 0
+    for card_id in chosen:
+        front_text, back_text = cards[card_id]
+        item = f'"{front_text}","{back_text}"'
+        used += len(item) + 1
+        if used > VOCAB_CHAR_BUDGET and items:
+            break
+        items.append(item)
+    vocab = ';'.join(items)
 
     prompt = f"""
 Create a natural dialogue between two people (A and B) following these strict rules:
@@ -240,57 +441,83 @@ REQUIRED: Completely different context (e.g., discussing a bizarre work situatio
 Objective: Generate a dialogue that feels natural, surprising, and completely divorced from the original input while faithfully incorporating all provided vocabulary items.
 
 Items:
-{';'.join(vocab_list)}
+{vocab}
 """
-    
-    if model.lower() == 'gemini':
-        response = client.chat.completions.create(
-            model="gemini-1.5-pro",
-            n=1,
-            messages=[
-                {"role": "system", "content": "You are an expert in dialog creation. You can tell great, consistent stories that make sense. You are great at using the right idiom at the right time with the right meaning for the given context."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-    else:
-        response = client.chat.completions.create(
-            model="gpt-4o",
+    return prompt
+
+async def create_with_retry(create, **kwargs):
+    """
+    Await create(**kwargs), retrying transient API errors with exponential backoff and full jitter
+    """
+    for attempt in range(1, REQUEST_ATTEMPTS + 1):
+        try:
+            return await create(**kwargs)
+        except RETRYABLE_ERRORS as api_err:
+            if attempt == REQUEST_ATTEMPTS:
+                raise
+            delay = random.uniform(0, min(MAX_RETRY_DELAY, 2 ** attempt))
+            logger.warning(f"Model request failed ({api_err}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+async def request_story(client, model, prompt, semaphore):
+    """
+    Ask the model for one story, waiting for a free slot in semaphore
+    """
+    async with semaphore:
+        response = await create_with_retry(
+            client.chat.completions.create,
+            model="gemini-1.5-pro" if model.lower() == 'gemini' else "gpt-4o",
             n=1,
+            max_tokens=MAX_STORY_TOKENS,
             messages=[
                 {"role": "system", "content": "You are an expert in dialog creation. You can tell great, consistent stories that make sense. You are great at using the right idiom at the right time with the right meaning for the given context."},
                 {"role": "user", "content": prompt}
             ]
         )
 
-    story = response.choices[0].message.content
-    
-    # Insert story into examples table
-    cursor = conn.cursor()
-    example_id = str(uuid.uuid4())
-    cursor.execute('''
-        INSERT INTO examples (id, body)
-        VALUES (?, ?)
-    ''', (example_id, story))
-    conn.commit()
-    
-    # Generate static HTML
+    return response.choices[0].message.content
 
-    def process_cloze(match):
-        full_text = match.group(0)
-        try:
-            content, hint = full_text[1:-1].split('](')
-            escaped_content = html.escape(content)
-            escaped_hint = html.escape(hint)
-            return f'<span class="cloze" onclick="revealCloze(this)" data-original="{escaped_content}" title="{escaped_hint}">[…]</span><span class="hint">({escaped_hint})</span>'
-        except ValueError:
-            # Fallback if split fails
-            return full_text
+async def request_stories(options, model, prompts):
+    """
+    Request a story for every prompt concurrently, at most MAX_CONCURRENT_REQUESTS at a time
 
-    # Ensure dialog parts start on new lines
-    story_with_line_breaks = re.sub(r'^(A:|B:)', r'<br>\1', story, flags=re.MULTILINE)
-    story_with_clozes = re.sub(r'\[.*?\]\(.*?\)', process_cloze, story_with_line_breaks)
+    Failed requests are returned as their exception instead of a story.
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    # Retries are handled by create_with_retry
+    async with AsyncOpenAI(max_retries=0, **options) as client:
+        return await asyncio.gather(
+            *(request_story(client, model, prompt, semaphore) for prompt in prompts),
+            return_exceptions=True
+        )
+
+def generate_example_stories(conn, model, count):
+    """
+    Generate count example stories concurrently and store them in the examples table
 
-    script_content = """
+    Returns the stored stories as (example_id, story) pairs, or None if the API key for
+    the model is missing.
+    """
+    options = client_options(model)
+    if options is None:
+        return None
+
+    # Every story draws its own random vocabulary from the same candidates
+    vocabulary_ids = fetch_vocabulary_ids(conn)
+    prompts = [build_story_prompt(conn, vocabulary_ids) for _ in range(count)]
+    results = asyncio.run(request_stories(options, model, prompts))
+
+    stories = []
+    for result in results:
+        if isinstance(result, BaseException):
+            logger.error(f"Example story generation failed: {result}")
+            continue
+        stories.append((save_example_story(conn, result), result))
+
+    return stories
+
+# Static parts of the example story page; the story goes between HTML_HEAD and HTML_TAIL
+SCRIPT_CONTENT = """
     <script>
         let clozeElements = [];
         let currentClozeIndex = 0;
@@ -344,65 +571,89 @@ Items:
     </script>
 """
 
-    html_template = f"""<!DOCTYPE html>
+HTML_HEAD = """<!DOCTYPE html>
 <html>
 <head>
     <title>Language Exercise</title>
     <style>
-        .cloze {{
+        .cloze {
             cursor: pointer;
             background-color: #f0f0f0;
             padding: 0 4px;
             border-radius: 3px;
-        }}
+        }
         
-        html, body {{
+        html, body {
             font-size: 21px;
             max-width: 32rem;
             line-height: 1.5;
             margin-top: -25px;
             padding: 1rem;
             font-family: Arial, sans-serif;
-        }}
+        }
         
-        br {{
+        br {
             margin-bottom: 16px;
-        }}
+        }
             
 
-        .revealed {{
+        .revealed {
             font-style: italic;
             background-color: hsl(56, 100%, 80%);
             padding: 5px
-        }}
+        }
         
-        .hint {{
+        .hint {
             color: #999;
             font-size: 0.9em;
             margin-left: 0.5em;
-        }}
+        }
     </style>
-{script_content}
+""" + SCRIPT_CONTENT + """
 </head>
 <body>
-    <div>{story_with_clozes}</div>
+    <div>"""
+
+HTML_TAIL = """</div>
 </body>
 </html>"""
 
+def save_example_story(conn, story):
+    """
+    Insert a story into the examples table and return its ID
+    """
+    # Insert story into examples table, committed by the caller
+    example_id = str(uuid.uuid4())
+    conn.execute('''
+        INSERT INTO examples (id, body)
+        VALUES (?, ?)
+    ''', (example_id, story))
+    return example_id
+
+def write_example_page(example_id, story):
+    """
+    Write a stored story as an HTML cloze exercise and open it in the browser
+    """
+    # Generate static HTML
+
+    # Ensure dialog parts start on new lines
+    story_with_line_breaks = DIALOG_LINE_RE.sub(r'<br>\1', story)
+    story_with_clozes = CLOZE_RE.sub(process_cloze, story_with_line_breaks)
+
+    html_template = HTML_HEAD + story_with_clozes + HTML_TAIL
+
     # Ensure the out/ directory exists
-    os.makedirs('out', exist_ok=True)
+    out_dir = Path('out')
+    out_dir.mkdir(exist_ok=True)
     
     # Write static HTML using the example ID as the filename
-    html_filename = f"out/{example_id.split('-')[0]}.html"
-    with open(html_filename, 'w', encoding='utf-8') as f:
-        f.write(html_template)
-    
-    logger.info(f"Successfully created example story with ID: {example_id} in {html_filename}")
+    html_path = out_dir / f"{example_id.split('-')[0]}.html"
+    html_path.write_text(html_template, encoding='utf-8')
     
-    # Open the HTML file with the default web browser
-    os.system(f'open {html_filename}')
+    logger.info(f"Successfully created example story with ID: {example_id} in {html_path}")
     
-    return story
+    # Open the HTML file with the default web browser, without going through a shell
+    webbrowser.open(html_path.resolve().as_uri())
 
 if __name__ == '__main__':
     convert_pauker_to_sqlite()
@@ -1,159 +1,166 @@
 import os
 import click
 import gzip
-import xml.etree.ElementTree as ET
 import sqlite3
 import uuid
 import logging
 import traceback
 import html
 import re
-from openai import OpenAI
+import itertools
+import random
+import asyncio
+import webbrowser
+from pathlib import Path
+from openai import AsyncOpenAI, APIConnectionError, InternalServerError, RateLimitError
 from pydantic import BaseModel, Field
 
+# Prefer lxml's libxml2-backed parser, fall back to the standard library
+try:
+    from lxml import etree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+
+# Prefer ISA-L's accelerated gzip, which decompresses on a background thread
+try:
+    from isal import igzip_threaded as gzip_reader
+except ImportError:
+    gzip_reader = gzip
+
 # Configure logging
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Cards per multi-row INSERT; 5 values each stays below SQLite's historic 999 variable limit
+CARDS_PER_INSERT = 199
+
+# Cards drawn as vocabulary for each example story
+VOCAB_ITEMS = 15
+
+# Upper bound on example story requests in flight at once
+MAX_CONCURRENT_REQUESTS = 5
+
+# Attempts per story request and the cap on the backoff between them, in seconds
+REQUEST_ATTEMPTS = 3
+MAX_RETRY_DELAY = 60
+
+# Transient API failures worth retrying; APITimeoutError is an APIConnectionError
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
+
+# Dialog line starts and [Polish translation] clozes in a generated story, matched in one pass
+STORY_MARKUP_RE = re.compile(r'(?P<line>^(?:A:|B:))|\[(?P<translation>[^\]\n]*)\]', re.MULTILINE)
+
 @click.command()
 @click.option('-i', '--input', 'input_file', type=click.Path(exists=True), required=True, help='Input Pauker .pau.gz file')
 @click.option('-o', '--output', 'output', type=click.Path(), required=True, help='Output SQLite database file')
 @click.option('--example', is_flag=True, help='Generate an example story using vocabulary from cards not in batch 1')
 @click.option('--model', type=click.Choice(['openai', 'gemini'], case_sensitive=False), default='openai', help='Specify the model to use for generating the example story')
-def convert_pauker_to_sqlite(input_file, output, example, model):
+@click.option('--example-count', type=click.IntRange(min=1), default=1, help='Number of example stories to generate concurrently with --example')
+@click.option('--open/--no-open', 'open_browser', default=True, help='Open the generated example story in the web browser')
+@click.option('-v', '--verbose', is_flag=True, help='Enable debug logging')
+def convert_pauker_to_sqlite(input_file, output, example, model, example_count, open_browser, verbose):
     """
     Convert Pauker .pau.gz flashcard file to SQLite database
     """
+    if verbose:
+        logger.setLevel(logging.DEBUG)
+
     try:
         logger.debug(f"Starting conversion of {input_file}")
         
-        # Log input file details
-        logger.debug(f"Input file path: {input_file}")
-        logger.debug(f"Input file exists: {os.path.exists(input_file)}")
-        logger.debug(f"Input file size: {os.path.getsize(input_file)} bytes")
+        # Log input file details; click has already checked that it exists
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Input file path: {input_file}")
+            logger.debug(f"Input file size: {os.stat(input_file).st_size} bytes")
 
         # Ensure output directory exists
         output_dir = os.path.dirname(os.path.abspath(output))
         logger.debug(f"Output directory: {output_dir}")
         os.makedirs(output_dir, exist_ok=True)
 
-        # Open the gzipped file with extensive logging
-        try:
-            logger.debug("Attempting to open gzipped file")
-            with gzip.open(input_file, 'rt', encoding='utf-8') as f:
-                logger.debug("Successfully opened gzipped file")
-                
-                # Parse the XML with detailed logging
-                try:
-                    logger.debug("Parsing XML")
-                    tree = ET.parse(f)
-                    root = tree.getroot()
-                    logger.debug(f"XML root tag: {root.tag}")
-                except ET.ParseError as xml_err:
-                    logger.error(f"XML Parsing error: {xml_err}")
-                    logger.error(traceback.format_exc())
-                    raise
-
-        except (IOError, gzip.BadGzipFile) as gz_err:
-            logger.error(f"Error opening gzipped file: {gz_err}")
-            logger.error(traceback.format_exc())
-            raise
-
         # Create/connect to SQLite database with logging
         try:
             logger.debug(f"Attempting to create SQLite database: {output}")
+            output_existed = os.path.exists(output)
             conn = sqlite3.connect(output)
             cursor = conn.cursor()
             logger.debug("SQLite connection established")
 
-            # Create tables if they don't exist
-            # Drop and recreate cards table to ensure fresh start
-            cursor.execute('DROP TABLE IF EXISTS cards')
-            cursor.execute('''
-                CREATE TABLE cards (
-                    id TEXT PRIMARY KEY,
-                    batch_number INTEGER,
-                    front_text TEXT,
-                    back_text TEXT,
-                    learned_timestamp INTEGER
-                )
-            ''')
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS examples (
-                    id TEXT PRIMARY KEY,
-                    date DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    body TEXT
-                )
-            ''')
-            logger.debug("Cards and Examples tables created")
-
-            # Track number of cards processed
-            total_cards = 0
-            total_batches = 0
-
-            # Process batches with detailed logging
-            batches = root.findall('.//Batch')
-            logger.debug(f"Total batches found: {len(batches)}")
-
-            for batch_index, batch in enumerate(batches, 1):
-                total_batches += 1
-                logger.debug(f"Processing batch {batch_index}")
-                
-                cards = batch.findall('Card')
-                logger.debug(f"Cards in batch {batch_index}: {len(cards)}")
-                
-                for card_index, card in enumerate(cards, 1):
-                    # Extract front side details with logging
-                    front_side = card.find('FrontSide')
-                    front_text = ''
-                    learned_timestamp = 0
-                    
-                    if front_side is not None:
-                        front_text_elem = front_side.find('Text')
-                        if front_text_elem is not None:
-                            front_text = f'"{front_text_elem.text or ""}"'
-                        learned_timestamp = front_side.get('LearnedTimestamp', 0)
-                    
-                    # Extract reverse side details with logging
-                    reverse_side = card.find('ReverseSide')
-                    back_text = ''
-                    
-                    if reverse_side is not None:
-                        back_text_elem = reverse_side.find('Text')
-                        if back_text_elem is not None:
-                            back_text = f'"{back_text_elem.text or ""}"'
-
-                    # Create simple sequential card identifier
-                    card_id = f'card{total_cards + 1}'
-
-                    # Log card details before insertion
-                    logger.debug(f"Card details - Batch: {batch_index}, ID: {card_id}")
-                    logger.debug(f"Front text: {front_text[:50]}...")
-                    logger.debug(f"Back text: {back_text[:50]}...")
-
-                    # Insert into database
-                    try:
-                        cursor.execute('''
-                            INSERT INTO cards 
-                            (id, batch_number, front_text, back_text, learned_timestamp)
-                            VALUES (?, ?, ?, ?, ?)
-                        ''', (card_id, batch_index, front_text, back_text, learned_timestamp))
-                        total_cards += 1
-                    except sqlite3.Error as sql_err:
-                        logger.error(f"SQLite insertion error: {sql_err}")
-                        logger.error(traceback.format_exc())
+            # Sync only at the critical moments of a commit; this lasts for the
+            # connection and leaves the database's journal mode untouched
+            cursor.execute('PRAGMA synchronous=NORMAL')
+
+            try:
+                # Replace the cards and load them in a single transaction, so a
+                # failed parse leaves the previous cards in place
+                conn.execute('BEGIN')
+
+                # Create tables if they don't exist
+                # Drop and recreate cards table to ensure fresh start
+                cursor.execute('DROP TABLE IF EXISTS cards')
+                cursor.execute('''
+                    CREATE TABLE cards (
+                        id TEXT PRIMARY KEY,
+                        batch_number INTEGER,
+                        front_text TEXT,
+                        back_text TEXT,
+                        learned_timestamp INTEGER
+                    )
+                ''')
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS examples (
+                        id TEXT PRIMARY KEY,
+                        date DATETIME DEFAULT CURRENT_TIMESTAMP,
+                        body TEXT
+                    )
+                ''')
+                logger.debug("Cards and Examples tables created")
+
+                # Track number of batches and cards processed
+                counts = {'batches': 0, 'cards': 0}
+
+                # Open the gzipped file with extensive logging
+                try:
+                    logger.debug("Attempting to open gzipped file")
+                    with gzip_reader.open(input_file, 'rb') as f:
+                        logger.debug("Successfully opened gzipped file")
+
+                        # Stream parsed cards straight into the database
+                        try:
+                            logger.debug("Parsing XML")
+                            insert_cards(cursor, iter_cards(f, counts))
+
+                        except ET.ParseError as xml_err:
+                            logger.error(f"XML Parsing error: {xml_err}")
+                            logger.error(traceback.format_exc())
+                            raise
+
+                except (IOError, gzip.BadGzipFile) as gz_err:
+                    logger.error(f"Error opening gzipped file: {gz_err}")
+                    logger.error(traceback.format_exc())
+                    raise
+
+                # Commit the cards before any example story is requested
+                conn.commit()
+
+            except Exception:
+                # Don't leave a new, empty output behind when the load fails
+                conn.close()
+                if not output_existed:
+                    os.remove(output)
+                raise
 
             if example:
-                story = generate_example_story(conn, batch_index=1, model=model)  # Default to batch 1
-                if story is None:
+                stories = generate_example_stories(conn, model=model, count=example_count, open_browser=open_browser)
+                if stories is None:
                     logger.warning("Skipping example story generation due to missing API key")
 
-            # Commit the transaction and close the connection
+            # Commit the example stories and close the connection
             conn.commit()
             conn.close()
             logger.info(f"Successfully created SQLite database: {output}")
-            logger.info(f"Total batches processed: {total_batches}")
-            logger.info(f"Total cards processed: {total_cards}")
+            logger.info(f"Total batches processed: {counts['batches']}")
+            logger.info(f"Total cards processed: {counts['cards']}")
 
         except sqlite3.Error as db_err:
             logger.error(f"SQLite database error: {db_err}")
@@ -165,6 +172,89 @@ def convert_pauker_to_sqlite(input_file, output, example, model):
         logger.error(traceback.format_exc())
         raise
 
+def iter_cards(f, counts):
+    """
+    Stream card rows from a Pauker XML file, keeping only the current card in memory
+
+    Yields (id, batch_number, front_text, back_text, learned_timestamp) tuples and
+    keeps the running batch and card totals in counts.
+    """
+    context = ET.iterparse(f, events=('start', 'end'))
+    _, root = next(context)
+    logger.debug("XML root tag: %s", root.tag)
+
+    for event, elem in context:
+        if event == 'start':
+            # Batches are numbered in document order
+            if elem.tag == 'Batch':
+                counts['batches'] += 1
+                logger.debug("Processing batch %d", counts['batches'])
+            continue
+
+        if elem.tag == 'Batch':
+            # Release the finished batch and its cleared cards
+            elem.clear()
+            root.clear()
+            continue
+
+        if elem.tag != 'Card':
+            continue
+
+        card = elem
+
+        # Extract front side details
+        front_side = card.find('FrontSide')
+        front_text = ''
+        learned_timestamp = 0
+
+        if front_side is not None:
+            front_text_elem = front_side.find('Text')
+            if front_text_elem is not None:
+                front_text = front_text_elem.text or ''
+            learned_timestamp = int(front_side.get('LearnedTimestamp') or 0)
+
+        # Extract reverse side details
+        reverse_side = card.find('ReverseSide')
+        back_text = ''
+
+        if reverse_side is not None:
+            back_text_elem = reverse_side.find('Text')
+            if back_text_elem is not None:
+                back_text = back_text_elem.text or ''
+
+        # The card's contents are extracted, drop its subtree
+        card.clear()
+
+        # Create simple sequential card identifier
+        counts['cards'] += 1
+        yield (f"card{counts['cards']}", counts['batches'], front_text, back_text, learned_timestamp)
+
+def card_insert_sql(row_count):
+    """
+    Build an INSERT statement for row_count cards
+    """
+    placeholders = ', '.join(['(?, ?, ?, ?, ?)'] * row_count)
+    return f'INSERT INTO cards (id, batch_number, front_text, back_text, learned_timestamp) VALUES {placeholders}'
+
+def insert_cards(cursor, rows):
+    """
+    Insert card rows CARDS_PER_INSERT at a time with multi-row INSERT statements
+    """
+    # Every full chunk reuses the same SQL text, so it stays in the statement cache
+    chunk_sql = card_insert_sql(CARDS_PER_INSERT)
+    rows = iter(rows)
+    try:
+        while True:
+            chunk = list(itertools.islice(rows, CARDS_PER_INSERT))
+            if not chunk:
+                break
+            sql = chunk_sql if len(chunk) == CARDS_PER_INSERT else card_insert_sql(len(chunk))
+            cursor.execute(sql, list(itertools.chain.from_iterable(chunk)))
+    except sqlite3.Error as sql_err:
+        logger.error(f"SQLite insertion error: {sql_err}")
+        logger.error(traceback.format_exc())
+        raise
+
 class DialogLine(BaseModel):
     speaker: str = Field(..., description="Speaker identifier (A or B)")
     german: str = Field(..., description="German sentence")
@@ -173,44 +263,59 @@ class DialogLine(BaseModel):
 class Dialog(BaseModel):
     lines: list[DialogLine] = Field(..., description="List of dialog lines")
 
-def generate_example_story(conn, batch_index, model):
+def process_cloze(match):
+    """
+    Render a [Polish translation] cloze as a clickable span
+    """
+    escaped_content = html.escape(match.group('translation'))
+    return f'<span class="cloze" onclick="revealCloze(this)" data-original="{escaped_content}">[…]</span>'
+
+def process_story_markup(match):
+    """
+    Start a dialog line on a new line, or render a cloze
+    """
+    if match.group('line'):
+        return '<br>' + match.group('line')
+    return process_cloze(match)
+
+def client_options(model):
+    """
+    Return the OpenAI client arguments for the selected model, or None if its API key is missing
+    """
     if model.lower() == 'gemini':
         api_key = os.environ.get('GEMINI_API_KEY')
         if not api_key:
             logger.error("GEMINI_API_KEY environment variable not set")
             return None
 
-        client = OpenAI(
-            api_key=api_key,
-            base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
-        )
-    else:
-        api_key = os.environ.get('OPENAI_API_KEY')
-        if not api_key:
-            logger.error("OPENAI_API_KEY environment variable not set")
-            return None
+        return {
+            'api_key': api_key,
+            'base_url': "https://generativelanguage.googleapis.com/v1beta/openai/"
+        }
 
-        client = OpenAI(
-            api_key=api_key
-        )
+    api_key = os.environ.get('OPENAI_API_KEY')
+    if not api_key:
+        logger.error("OPENAI_API_KEY environment variable not set")
+        return None
 
-    # Query database for cards not in batch 1, sorted by learned_timestamp
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT front_text, back_text 
+    return {'api_key': api_key}
+
+def fetch_vocabulary_rowids(conn):
+    """
+    Return the rowids of the non-empty cards outside batch 1 that stories draw vocabulary from
+    """
+    cursor = conn.execute('''
+        SELECT rowid
         FROM cards 
         WHERE batch_number != 1 
-        ORDER BY random()
-        LIMIT 15
+          AND (front_text != '' OR back_text != '')
     ''')
-    
-    vocab_list = []
-    for front_text, back_text in cursor.fetchall():
-        # Only add non-empty entries
-        if front_text or back_text:
-            vocab_list.append(f"{front_text},{back_text}")
+    return [rowid for (rowid,) in cursor]
+
+# Fixed story instructions, sent as the system message so every request shares the
+# same prefix; the user message only carries the vocabulary items
+STORY_INSTRUCTIONS = """You are an expert in dialog creation for A1 beginner level learners of Polish. Create a dialog with a clear structure.
 
-    prompt = f"""
 Create a natural dialogue between two people (A and B) following these strict rules:
 1. Input Vocabulary Format:
 - Items to be provided in format (front/back): German Sentence;Polish Translation
@@ -240,25 +345,48 @@ FORBIDDEN: Repeating 2nd person, present tense scenario
 REQUIRED: Completely different context (e.g., different person, time, object)
 
 Objective: Generate a dialogue that feels natural, surprising, and completely divorced from the original input while faithfully incorporating all provided vocabulary items.
-
-Items:
-{';'.join(vocab_list)}
 """
-    
-    if model.lower() == 'gemini':
-        response = client.beta.chat.completions.parse(
-            model="gemini-1.5-pro",
-            messages=[
-                {"role": "system", "content": "You are an expert in dialog creation for A1 beginner level learners of Polish. Create a dialog with a clear structure."},
-                {"role": "user", "content": prompt}
-            ],
-            response_format=Dialog,
-        )
-    else:
-        response = client.beta.chat.completions.parse(
-            model="gpt-4o",
+
+def build_story_prompt(conn, rowids):
+    """
+    Build the user message listing a random selection of the cards in rowids
+    """
+    # Sample in Python and fetch only the chosen cards instead of sorting them all by random()
+    chosen = random.sample(rowids, min(VOCAB_ITEMS, len(rowids)))
+    placeholders = ', '.join('?' * len(chosen))
+    cursor = conn.execute(f'SELECT rowid, front_text, back_text FROM cards WHERE rowid IN ({placeholders})', chosen)
+
+    # Quote trimmed items as the instructions describe and join them in the sampled
+    # order, listing cards with the same text only once
+    vocab = {rowid: f'"{front_text.strip()}","{back_text.strip()}"' for rowid, front_text, back_text in cursor}
+    items = ';'.join(dict.fromkeys(vocab[rowid] for rowid in chosen))
+
+    return f"Items:\n{items}\n"
+
+async def create_with_retry(create, **kwargs):
+    """
+    Await create(**kwargs), retrying transient API errors with exponential backoff and full jitter
+    """
+    for attempt in range(1, REQUEST_ATTEMPTS + 1):
+        try:
+            return await create(**kwargs)
+        except RETRYABLE_ERRORS as api_err:
+            if attempt == REQUEST_ATTEMPTS:
+                raise
+            delay = random.uniform(0, min(MAX_RETRY_DELAY, 2 ** attempt))
+            logger.warning(f"Model request failed ({api_err}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+async def request_story(client, model, prompt, semaphore):
+    """
+    Ask the model for one structured dialog, waiting for a free slot in semaphore
+    """
+    async with semaphore:
+        response = await create_with_retry(
+            client.beta.chat.completions.parse,
+            model="gemini-1.5-pro" if model.lower() == 'gemini' else "gpt-4o",
             messages=[
-                {"role": "system", "content": "You are an expert in dialog creation for A1 beginner level learners of Polish. Create a dialog with a clear structure."},
+                {"role": "system", "content": STORY_INSTRUCTIONS},
                 {"role": "user", "content": prompt}
             ],
             response_format=Dialog,
@@ -267,35 +395,52 @@ Items:
     dialog = response.choices[0].message.parsed
     
     # Convert structured dialog to text format
-    story = "\n".join([f"{line.speaker}: {line.german} [{line.polish}]" for line in dialog.lines])
-    
-    # Insert story into examples table
-    cursor = conn.cursor()
-    example_id = str(uuid.uuid4())
-    cursor.execute('''
-        INSERT INTO examples (id, body)
-        VALUES (?, ?)
-    ''', (example_id, story))
-    conn.commit()
-    
-    # Generate static HTML
+    return "\n".join(f"{line.speaker}: {line.german} [{line.polish}]" for line in dialog.lines)
 
-    def process_cloze(match):
-        full_text = match.group(0)
-        try:
-            # Extract the Polish translation from between square brackets
-            polish_translation = full_text[full_text.index('[')+1:full_text.index(']')]
-            escaped_content = html.escape(polish_translation)
-            return f'<span class="cloze" onclick="revealCloze(this)" data-original="{escaped_content}">[…]</span>'
-        except (ValueError, IndexError):
-            # Fallback if parsing fails
-            return full_text
-
-    # Ensure dialog parts start on new lines
-    story_with_line_breaks = re.sub(r'^(A:|B:)', r'<br>\1', story, flags=re.MULTILINE)
-    story_with_clozes = re.sub(r'\[.*?\]', process_cloze, story_with_line_breaks)
-
-    script_content = """
+async def request_stories(options, model, prompts):
+    """
+    Request a story for every prompt concurrently, at most MAX_CONCURRENT_REQUESTS at a time
+
+    Failed requests are returned as their exception instead of a story.
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    # Retries are handled by create_with_retry
+    async with AsyncOpenAI(max_retries=0, **options) as client:
+        return await asyncio.gather(
+            *(request_story(client, model, prompt, semaphore) for prompt in prompts),
+            return_exceptions=True
+        )
+
+def generate_example_stories(conn, model, count, open_browser=True):
+    """
+    Generate count example stories concurrently, store them and write one HTML page each
+
+    Returns the generated stories, or None if the API key for the model is missing.
+    """
+    options = client_options(model)
+    if options is None:
+        return None
+
+    # Every story draws its own random vocabulary from the same candidates
+    rowids = fetch_vocabulary_rowids(conn)
+    prompts = [build_story_prompt(conn, rowids) for _ in range(count)]
+    results = asyncio.run(request_stories(options, model, prompts))
+
+    # Ensure the out/ directory exists, once for all stories
+    os.makedirs('out', exist_ok=True)
+
+    stories = []
+    for result in results:
+        if isinstance(result, BaseException):
+            logger.error(f"Example story generation failed: {result}")
+            continue
+        save_example_story(conn, result, open_browser)
+        stories.append(result)
+
+    return stories
+
+# Static parts of the example story page; the story goes between HTML_HEAD and HTML_TAIL
+SCRIPT_CONTENT = """
     <script>
         let clozeElements = [];
         let currentClozeIndex = 0;
@@ -349,65 +494,81 @@ Items:
     </script>
 """
 
-    html_template = f"""<!DOCTYPE html>
+HTML_HEAD = """<!DOCTYPE html>
 <html>
 <head>
     <title>Cloze Text Example</title>
     <style>
-        .cloze {{
+        .cloze {
             cursor: pointer;
             background-color: #f0f0f0;
             padding: 0 4px;
             border-radius: 3px;
-        }}
+        }
         
-        html, body {{
+        html, body {
             font-size: 21px;
             max-width: 32rem;
             line-height: 1.5;
             margin-top: -25px;
             padding: 1rem;
             font-family: Arial, sans-serif;
-        }}
+        }
         
-        br {{
+        br {
             margin-bottom: 16px;
-        }}
+        }
             
 
-        .revealed {{
+        .revealed {
             font-style: italic;
             background-color: hsl(56, 100%, 80%);
             padding: 5px
-        }}
+        }
         
-        .hint {{
+        .hint {
             color: #999;
             font-size: 0.9em;
             margin-left: 0.5em;
-        }}
+        }
     </style>
-{script_content}
+""" + SCRIPT_CONTENT + """
 </head>
 <body>
-    <div>{story_with_clozes}</div>
+    <div>"""
+
+HTML_TAIL = """</div>
 </body>
 </html>"""
 
-    # Ensure the out/ directory exists
-    os.makedirs('out', exist_ok=True)
+def save_example_story(conn, story, open_browser):
+    """
+    Insert a story into the examples table and write it as an HTML cloze exercise
+    """
+    # Insert story into examples table; convert_pauker_to_sqlite commits all stories together
+    example_id = str(uuid.uuid4())
+    conn.execute('''
+        INSERT INTO examples (id, body)
+        VALUES (?, ?)
+    ''', (example_id, story))
     
-    # Write static HTML using the example ID as the filename
+    # Generate static HTML
+
+    # Ensure dialog parts start on new lines and turn translations into clozes
+    story_with_clozes = STORY_MARKUP_RE.sub(process_story_markup, story)
+
+    html_template = HTML_HEAD + story_with_clozes + HTML_TAIL
+
+    # Write static HTML using the example ID as the filename; out/ is created by the caller
     html_filename = f"out/{example_id.split('-')[0]}.html"
     with open(html_filename, 'w', encoding='utf-8') as f:
         f.write(html_template)
     
     logger.info(f"Successfully created example story with ID: {example_id} in {html_filename}")
     
-    # Open the HTML file with the default web browser
-    os.system(f'open {html_filename}')
-    
-    return story
+    # Open the HTML file with the default web browser, without going through a shell
+    if open_browser:
+        webbrowser.open(Path(html_filename).resolve().as_uri())
 
 if __name__ == '__main__':
     convert_pauker_to_sqlite()